@@ -3,10 +3,20 @@ from datetime import datetime
 from pathlib import Path
 
 import streamlit as st
+from sqlalchemy import select
+from sqlalchemy.orm import load_only, selectinload
 
 from examples.models import Base, Task, User
 from streamlit_sqlalchemy import StreamlitAlchemyMixin
 
+PAGE_SIZE = 40
+
+# st.fragment needs streamlit >= 1.37 (st.experimental_fragment since 1.33),
+# on older versions the tasks are rendered with the rest of the script
+_fragment = getattr(st, "fragment", None) or getattr(
+    st, "experimental_fragment", lambda function: function
+)
+
 
 @st.cache_resource
 def _configure_logging():
@@ -21,25 +31,25 @@ def _configure_logging():
     logger.setLevel(logging.INFO)
 
 
+_INLINE_CSS = """
+    <style>
+        div[data-testid="column"] {
+            width: fit-content !important;
+            flex: unset;
+        }
+        div[data-testid="column"] * {
+            width: fit-content !important;
+        }
+    </style>
+    """
+
+
 def _display_inline():
     """
     Make the columns inline.
     (https://stackoverflow.com/questions/69492406/streamlit-how-to-display-buttons-in-a-single-line)
     """
-    st.markdown(
-        """
-        <style>
-            div[data-testid="column"] {
-                width: fit-content !important;
-                flex: unset;
-            }
-            div[data-testid="column"] * {
-                width: fit-content !important;
-            }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(_INLINE_CSS, unsafe_allow_html=True)
 
 
 def show_single_task(task):
@@ -62,32 +72,69 @@ def show_single_task(task):
             task.st_delete_button()
 
 
+@_fragment
+def show_user_tasks(user_id, user_name):
+    """
+    Interacting with the tasks of a user only reruns this function,
+    not the whole script.
+    """
+    with st.expander(f"### {user_name}'s tasks:"):
+        c = st.container()
+
+        st.write("**Add a new task:**")
+        Task.st_create_form(defaults={"user_id": user_id, "done": False})
+        with c:
+            tasks = st.session_state["tasks_by_user"].pop(user_id, None)
+            if tasks is None:
+                # this fragment reruns on its own, after a write to the tasks
+                # of its user, only these are read again
+                tasks = Task.st_list_all(filter_by={"user_id": user_id})
+            if not tasks:
+                st.caption("No tasks yet.")
+
+            for task in tasks:
+                show_single_task(task)
+
+
 def app():
     st.title("Streamlit SQLAlchemy Demo")
 
     User.st_crud_tabs()
 
+    # render the users by pages, "Load more" appends the next page
+    shown = st.session_state.setdefault("shown_users", PAGE_SIZE)
     with CONNECTION.session as session:
-        for user in session.query(User).all():
-            with st.expander(f"### {user.name}'s tasks:"):
-                c = st.container()
-
-                st.write("**Add a new task:**")
-                Task.st_create_form(defaults={"user_id": user.id, "done": False})
-                with c:
-                    if not user.tasks:
-                        st.caption("No tasks yet.")
-
-                    for task in user.tasks:
-                        show_single_task(task)
+        # only the id and the name of the users are displayed, and the tasks
+        # of all of them are loaded with a single "WHERE user_id IN (...)"
+        users = session.scalars(
+            select(User)
+            .options(load_only(User.id, User.name), selectinload(User.tasks))
+            .order_by(User.id)
+            .limit(shown + 1)
+        ).all()
+
+    # consumed by the fragments of this run
+    st.session_state["tasks_by_user"] = {user.id: user.tasks for user in users}
+    for user in users[:shown]:
+        show_user_tasks(user.id, user.name)
+
+    if len(users) > shown:
+        st.button(
+            "Load more",
+            on_click=lambda: st.session_state.update(shown_users=shown + PAGE_SIZE),
+        )
 
 
 def main():
-    if not Path("example.db").exists():
-        Base.metadata.create_all(CONNECTION.engine)
+    # initialize the StreamlitAlchemyMixin, before the first connection
+    # is opened so that the pragmas apply to it
+    StreamlitAlchemyMixin.st_initialize(connection=CONNECTION, sqlite_pragmas=True)
 
-    # initialize the StreamlitAlchemyMixin
-    StreamlitAlchemyMixin.st_initialize(connection=CONNECTION)
+    if not Path("example.db").exists():
+        # Base is shared with example2, only the tables of this app are created
+        Base.metadata.create_all(
+            CONNECTION.engine, tables=[User.__table__, Task.__table__]
+        )
 
     # make the columns inline
     _display_inline()
@@ -1,24 +1,11 @@
 from pathlib import Path
 
 import streamlit as st
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text
-from sqlalchemy.ext.declarative import declarative_base
 
+from examples.models import Base, YourModel
 from streamlit_sqlalchemy import StreamlitAlchemyMixin
 
-Base = declarative_base()
-
-
-# Create your SQLAlchemy model
-class YourModel(Base, StreamlitAlchemyMixin):
-    __tablename__ = "your_model"
-
-    id = Column(Integer, primary_key=True)
-    name = Column(String)
-    active = Column(Boolean, default=True)
-    count = Column(Integer)
-    text = Column(Text)
-    created_at = Column(DateTime)
+PAGE_SIZE = 40
 
 
 def app():
@@ -26,19 +13,30 @@ def app():
 
     st.markdown("---")
 
+    # render the items by pages, "Load more" appends the next page
+    shown = st.session_state.setdefault("shown_items", PAGE_SIZE)
     with CONNECTION.session as session:
-        for item in session.query(YourModel).all():
+        items = session.query(YourModel).order_by(YourModel.id).limit(shown + 1).all()
+        for item in items[:shown]:
             st.subheader(item.name)
             item.st_edit_button("Edit", {"name": "New Name"})
             item.st_delete_button()
 
+    if len(items) > shown:
+        st.button(
+            "Load more",
+            on_click=lambda: st.session_state.update(shown_items=shown + PAGE_SIZE),
+        )
+
 
 def main():
-    if not Path("example.db").exists():
-        Base.metadata.create_all(CONNECTION.engine)
+    # initialize the StreamlitAlchemyMixin, before the first connection
+    # is opened so that the pragmas apply to it
+    StreamlitAlchemyMixin.st_initialize(connection=CONNECTION, sqlite_pragmas=True)
 
-    # initialize the StreamlitAlchemyMixin
-    StreamlitAlchemyMixin.st_initialize(connection=CONNECTION)
+    if not Path("example2.db").exists():
+        # Base is shared with example, only the tables of this app are created
+        Base.metadata.create_all(CONNECTION.engine, tables=[YourModel.__table__])
 
     # the actual app
     app()
@@ -48,9 +46,4 @@ if __name__ == "__main__":
     # initialize the database connection
     # (see https://docs.streamlit.io/library/api-reference/connections/st.connection)
     CONNECTION = st.connection("example2_db", type="sql")
-
-    if not Path("example2.db").exists():
-        Base.metadata.create_all(CONNECTION.engine)
-
-    StreamlitAlchemyMixin.st_initialize(connection=CONNECTION)
     main()
@@ -1,6 +1,15 @@
 import enum
 import streamlit as st
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Enum
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Integer,
+    String,
+    Text,
+)
 from sqlalchemy.orm import declarative_base, relationship
 
 from streamlit_sqlalchemy import StreamlitAlchemyMixin
@@ -24,6 +33,9 @@ class User(Base, StreamlitAlchemyMixin):
     name = Column(String)
     user_type = Column(Enum(UserType))
 
+    # in the order of Task.st_list_all
+    tasks = relationship("Task", back_populates="user", order_by="Task.description")
+
 
 class Task(Base, StreamlitAlchemyMixin):
     __tablename__ = "task"
@@ -35,8 +47,19 @@ class Task(Base, StreamlitAlchemyMixin):
 
     user_id = Column(Integer, ForeignKey("user.id"))
 
-    user = relationship("User", backref="tasks")
+    user = relationship("User", back_populates="tasks")
 
     __st_input_meta__ = {
         "description": lambda *a, **kw: st.text_area(*a, **kw, height=100),
     }
+
+
+class YourModel(Base, StreamlitAlchemyMixin):
+    __tablename__ = "your_model"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    active = Column(Boolean, default=True)
+    count = Column(Integer)
+    text = Column(Text)
+    created_at = Column(DateTime)
@@ -1,20 +1,42 @@
 import logging
 from datetime import date, datetime
-from hashlib import md5
-from typing import TYPE_CHECKING, Any, Callable, Optional, Protocol
+from functools import lru_cache
+from hashlib import blake2b
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional, Protocol
 
 import streamlit as st
-from sqlalchemy import Boolean, Column, Date, DateTime, Float, Text, Time, Enum
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Enum,
+    Float,
+    Select,
+    Text,
+    Time,
+    case,
+    delete,
+    event,
+    insert,
+    inspect,
+    literal,
+    select,
+    update,
+)
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    InstanceState,
+    Load,
+    Session,
+    raiseload,
+    sessionmaker,
+)
 from sqlalchemy.sql.sqltypes import Integer as SqlInteger
 from streamlit.connections.sql_connection import SQLConnection
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(module)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+logger = logging.getLogger(__name__)
 
 
 class DeclarativeBaseWithId(DeclarativeBase):
@@ -25,19 +47,39 @@ class InputFunction(Protocol):
     def __call__(self, label: str, value: Any | None = None) -> Any: ...
 
 
+class ColumnSpec(NamedTuple):
+    """
+    What the forms need to know about a column, resolved once per class.
+    """
+
+    name: str
+    label: str
+    column: Column
+    kind: str
+    default: Any
+
+
+@lru_cache(maxsize=None)
 def _st_pretty_class_name(cls: type[DeclarativeBase]) -> str:
     return " ".join(cls.__tablename__.split("_")).title()
 
 
+@lru_cache(maxsize=None)
 def _st_get_first_column_name(cls: type[DeclarativeBase]) -> Optional[str]:
-    for col in cls.__mapper__._all_column_expressions:
+    # called for every row displayed, the result is cached per class
+    for col in inspect(cls).columns:
         if col.name != "id":
             return col.name
 
 
 def _st_repr(obj: DeclarativeBase) -> str:
-    if hasattr(obj, "__st_repr__"):
-        return getattr(obj, "__st_repr__")()
+    try:
+        st_repr = type(obj)._st_repr_hook
+    except AttributeError:
+        # not a mixin class, e.g. the target of a foreign key
+        st_repr = getattr(type(obj), "__st_repr__", None)
+    if st_repr is not None:
+        return st_repr(obj)
 
     first_column_name = _st_get_first_column_name(type(obj))
     if first_column_name is not None:
@@ -46,9 +88,26 @@ def _st_repr(obj: DeclarativeBase) -> str:
     return repr(obj)
 
 
+def _st_object_id(value: Any) -> Any:
+    """
+    Returns the id of the object selected for a foreign key, other values
+    are returned as is.
+    """
+    if isinstance(inspect(value, raiseerr=False), InstanceState):
+        return value.id
+    return value
+
+
+@lru_cache(maxsize=None)
 def _st_order_by(cls: type[DeclarativeBaseWithId]) -> Optional[Column]:
-    if hasattr(cls, "__st_order_by__"):
-        return getattr(cls, "__st_order_by__")()
+    try:
+        st_order_by = cls._st_order_by_hook
+    except AttributeError:
+        # not a mixin class, e.g. the target of a foreign key
+        st_order_by = getattr(cls, "__st_order_by__", None)
+    if st_order_by is not None:
+        # evaluated against the class, `lambda self: self.count` gives the column
+        return st_order_by(cls)
 
     first_column_name = _st_get_first_column_name(cls)
     if first_column_name is not None:
@@ -57,10 +116,198 @@ def _st_order_by(cls: type[DeclarativeBaseWithId]) -> Optional[Column]:
     return cls.id
 
 
+def _st_eager_load(query: Select, cls: type[DeclarativeBase]) -> Select:
+    """
+    Eager loads the relationship paths listed in __st_eager__,
+    e.g. ("user", "car.model.brand").
+
+    Many-to-one relationships are outer joined explicitly and populated
+    with contains_eager, so the whole chain comes with the same SELECT.
+    Collections are loaded with a second "SELECT ... WHERE id IN (...)"
+    to avoid multiplying the rows of the parent query.
+
+    With __st_strict_loading__ set, any other relationship raises when
+    accessed instead of being lazy loaded.
+    """
+    if getattr(cls, "__st_strict_loading__", False):
+        query = query.options(raiseload("*"))
+
+    joined_tables = {cls.__table__}
+    joined_relationships = set()
+    for path in getattr(cls, "__st_eager__", ()):
+        loader = Load(cls)
+        current = cls
+        in_main_query = True
+        for name in path.split("."):
+            relationship = getattr(current, name).property
+            target = relationship.mapper
+            if relationship.uselist:
+                loader = loader.selectinload(relationship.class_attribute)
+                in_main_query = False
+            elif in_main_query and relationship in joined_relationships:
+                # joined by a previous path sharing this prefix
+                loader = loader.contains_eager(relationship.class_attribute)
+            elif in_main_query and target.local_table not in joined_tables:
+                query = query.outerjoin(relationship.class_attribute)
+                joined_tables.add(target.local_table)
+                joined_relationships.add(relationship)
+                loader = loader.contains_eager(relationship.class_attribute)
+            else:
+                # the table is already in the query (or the relationship is
+                # loaded by the IN query of a collection), let joinedload
+                # alias it, the rest of the path hangs from that alias
+                loader = loader.joinedload(relationship.class_attribute)
+                in_main_query = False
+            current = target.class_
+        query = query.options(loader)
+    return query
+
+
+# Number of rows fetched per round trip when listing a table.
+_ST_YIELD_PER = 500
+
+# Maximum number of options of a foreign key selectbox, for large tables
+# only the first ones (in the __st_order_by__ order) are sent to the
+# browser, with a caption saying so. The rows come from the cached list of
+# st_list_all, shared with the select forms of the same table.
+_ST_MAX_CHOICES = 1000
+
+# Bumped after every write, it is part of the key of the cached queries so
+# that a write made through the mixin is visible on the next rerun.
+_st_data_version = 0
+
+
+def _st_invalidate_cache() -> None:
+    global _st_data_version
+    _st_data_version += 1
+
+
+# Streamlit cannot hash connections, the cached queries are keyed by the
+# URL of the database and the identity of the engine instead: two engines
+# on the same URL (e.g. two in-memory "sqlite://") do not share their rows.
+_ST_HASH_FUNCS = {
+    SQLConnection: lambda conn: (str(conn.engine.url), id(conn.engine)),
+}
+
+
+def _st_filter_key(filter_by: dict) -> tuple:
+    """
+    Returns a hashable key for the given filter, the mapped objects (to
+    filter on a relationship) are replaced by their class and identity.
+    """
+    key = []
+    for name, value in sorted(filter_by.items()):
+        state = inspect(value, raiseerr=False)
+        if isinstance(state, InstanceState):
+            value = (type(value).__qualname__, state.identity)
+        key.append((name, value))
+    return tuple(key)
+
+
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs=_ST_HASH_FUNCS)
+def _st_cached_list_all(
+    _cls: type[DeclarativeBase],
+    conn: SQLConnection,
+    class_key: str,
+    version: int,
+    _filter_by: dict,
+    filter_key: tuple,
+) -> list:
+    """
+    Returns the (detached) objects of the given class, cached across
+    reruns and sessions until the next write or the ttl expires.
+
+    The query only runs on a cache miss, and its compiled SQL is then
+    reused from the compiled cache of the engine.
+    """
+    with conn.session as session:
+        # filter before joining, filter_by applies to the last joined entity
+        stmt = _st_eager_load(select(_cls).filter_by(**_filter_by), _cls)
+        stmt = stmt.order_by(_st_order_by(_cls))
+        result = session.execute(stmt, execution_options={"yield_per": _ST_YIELD_PER})
+        return result.scalars().all()
+
+
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs=_ST_HASH_FUNCS)
+def _st_cached_list_rows(
+    _cls: type[DeclarativeBase],
+    conn: SQLConnection,
+    class_key: str,
+    version: int,
+    _filter_by: dict,
+    filter_key: tuple,
+) -> list[dict]:
+    """
+    Same as _st_cached_list_all, but returns the rows of the table as
+    dictionaries, without building ORM objects.
+    """
+    with conn.session as session:
+        stmt = select(_cls.__table__).filter_by(**_filter_by)
+        result = session.execute(stmt.order_by(_st_order_by(_cls)))
+        return [dict(row) for row in result.mappings()]
+
+
+# Applied to every new SQLite connection: the forms commit many small
+# transactions, WAL with synchronous=NORMAL saves the fsyncs of each commit.
+_ST_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+)
+
+
+def _st_set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma in _ST_SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+# Per registry, the number of classes it had when indexed and the
+# {tablename: class} index used to resolve foreign keys.
+_st_tablename_index: dict[Any, tuple[int, dict[str, type]]] = {}
+
+
 def _get_unique_hash(**kwargs) -> str:
-    return md5((str(kwargs)).encode("utf-8")).hexdigest()
+    # sorted, so that the same arguments always give the same widget key
+    return blake2b(repr(sorted(kwargs.items())).encode(), digest_size=8).hexdigest()
 
 
+def _st_column_input_kind(column: Column) -> tuple[str, Any]:
+    """
+    Returns the kind of input rendered for the given column, with its
+    default value.
+    """
+
+    def get_default_value(default=None):
+        return column.default.arg if column.default else default
+
+    if column.foreign_keys:
+        return "foreign_key", None
+    if isinstance(column.type, Enum):
+        options = [o for o in column.type._object_lookup.values() if o is not None]
+        return "enum", get_default_value(default=options[0])
+    if isinstance(column.type, SqlInteger):
+        return "integer", get_default_value(default=0)
+    if isinstance(column.type, Float):
+        return "float", get_default_value(default=0.0)
+    if isinstance(column.type, Boolean):
+        return "boolean", get_default_value()
+    # without a default, the current date and time are taken when the
+    # input is rendered
+    if isinstance(column.type, DateTime):
+        return "datetime", get_default_value()
+    if isinstance(column.type, Date):
+        return "date", get_default_value()
+    if isinstance(column.type, Time):
+        return "time", get_default_value()
+    if isinstance(column.type, Text):
+        return "text", get_default_value(default="")
+    return "string", get_default_value(default="")
+
+
+@lru_cache(maxsize=512)
 def _get_pretty_column_name(name: str) -> str:
     if name.endswith("_id"):
         name = name[:-3]
@@ -86,19 +333,62 @@ class StreamlitAlchemyMixin(mixin_parent):
     __st_input_meta__: dict[str, InputFunction]
     __st_repr__: str | None
     __st_order_by__: Callable | None
+    __st_eager__: tuple[str, ...]
+    __st_strict_loading__: bool
+
+    # set by st_initialize, read through st_get_connection
+    __connection = None
+    __sessionmaker = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # the meta attributes are resolved once per class, instead of being
+        # looked up for every row and every column on each rerun
+        cls._st_repr_hook = getattr(cls, "__st_repr__", None)
+        cls._st_order_by_hook = getattr(cls, "__st_order_by__", None)
+        cls._st_input_meta = getattr(cls, "__st_input_meta__", {})
 
     @classmethod
-    def st_initialize(cls, connection: Optional[SQLConnection]):
+    def st_initialize(
+        cls, connection: Optional[SQLConnection], *, sqlite_pragmas: bool = False
+    ):
         """
         Must be called before any other method to initialize the engine.
+
+        Pass the handle returned by st.connection: it is cached with
+        st.cache_resource, so the engine and its pool are created once per
+        process instead of once per rerun.
+
+        :param sqlite_pragmas: For SQLite engines, set journal_mode=WAL and
+            synchronous=NORMAL (among others) on the connections opened
+            afterwards. WAL is persisted in the database file, and
+            synchronous=NORMAL may lose the last commits on a power loss.
         """
+        if connection is not None and sqlite_pragmas:
+            # registered once per engine, also when the connection was
+            # already given to a previous call without the pragmas
+            engine = connection.engine
+            if engine.dialect.name == "sqlite" and not event.contains(
+                engine, "connect", _st_set_sqlite_pragmas
+            ):
+                event.listen(engine, "connect", _st_set_sqlite_pragmas)
+
         if cls._st_is_initialized():
-            logging.warning(
-                f"StreamlitAlchemyMixin.st_initialize called multiple times for {cls.__name__}"
+            # called again on every rerun with the same cached connection
+            if cls.__connection is connection:
+                return
+            logger.warning(
+                f"StreamlitAlchemyMixin.st_initialize called with another connection for {cls.__name__}"
             )
-            return
 
         cls.__connection = connection
+        # the objects are not expired on commit, the writes do not read
+        # them back from the database
+        cls.__sessionmaker = (
+            sessionmaker(bind=connection.engine, expire_on_commit=False)
+            if connection is not None
+            else None
+        )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -110,7 +400,6 @@ class StreamlitAlchemyMixin(mixin_parent):
         """
         if item.startswith("st_"):
             self.__st_ensure_initialized()
-            return getattr(self, item)
         raise AttributeError(
             f"'{self.__class__.__name__}' object has no attribute '{item}'"
         )
@@ -130,20 +419,42 @@ class StreamlitAlchemyMixin(mixin_parent):
         assert cls.__connection is not None
         return cls.__connection
 
+    @classmethod
+    def _st_session(cls) -> Session:
+        """
+        Returns a new session from the sessionmaker created by st_initialize.
+        """
+        assert cls.__sessionmaker is not None
+        return cls.__sessionmaker()
+
     @classmethod
     def st_list_all(cls, filter_by: Optional[dict] = None):
         """
         Returns a list of all objects of this class.
 
+        :param filter_by: A dictionary of keyword arguments to filter by.
+        """
+        return cls._st_list_all_of(cls, filter_by or {})
+
+    @classmethod
+    def st_list_rows(cls, filter_by: Optional[dict] = None) -> list[dict]:
+        """
+        Returns the rows of this class as dictionaries, in the same order
+        as st_list_all. Cheaper than st_list_all when the objects are only
+        displayed, since no ORM object is built.
+
         :param filter_by: A dictionary of keyword arguments to filter by.
         """
         filter_by = filter_by or {}
         conn = cls.st_get_connection()
-        with conn.session as session:
-            query = (
-                session.query(cls).order_by(_st_order_by(cls)).filter_by(**filter_by)
-            )
-            return query.all()
+        return _st_cached_list_rows(
+            cls,
+            conn,
+            f"{cls.__module__}.{cls.__qualname__}",
+            _st_data_version,
+            filter_by,
+            _st_filter_key(filter_by),
+        )
 
     @classmethod
     def st_create_form(
@@ -168,24 +479,16 @@ class StreamlitAlchemyMixin(mixin_parent):
             f"create_{cls.__name__}_{unique_hash}", clear_on_submit=True, border=border
         ):
             kwargs = {}
-            for column in cls.__table__.columns:
-                if column.name == "id":
-                    continue
-                if column.name in defaults:
-                    kwargs.update({column.name: defaults[column.name]})
+            for spec in cls._st_column_specs():
+                if spec.name in defaults:
+                    kwargs[spec.name] = defaults[spec.name]
                     continue
 
-                input_function = cls._st_get_input_function(column)
-                kwargs.update(
-                    {
-                        column.name: input_function(
-                            _get_pretty_column_name(column.name),
-                        )
-                    }
-                )
+                input_function = cls._st_get_input_function(spec)
+                kwargs[spec.name] = input_function(spec.label)
 
             if any(default not in kwargs for default in defaults):
-                logging.warning(
+                logger.warning(
                     f"Some defaults {defaults} not found in {cls.st_pretty_class()} columns {kwargs.keys()}"
                 )
 
@@ -193,12 +496,9 @@ class StreamlitAlchemyMixin(mixin_parent):
 
             submitted = st.form_submit_button(f"Create {cls.st_pretty_class()}")
             if submitted:
-                for field in kwargs:
-                    if any(
-                        hasattr(kwargs[field], sql_field)
-                        for sql_field in ["foreign_keys", "_sa_instance_state"]
-                    ):
-                        kwargs[field] = kwargs[field].id
+                for field in cls._st_foreign_key_names():
+                    if field in kwargs:
+                        kwargs[field] = _st_object_id(kwargs[field])
                 cls._st_create(**kwargs)
 
         return submitted
@@ -210,6 +510,7 @@ class StreamlitAlchemyMixin(mixin_parent):
         except_columns: Optional[list] = None,
         *,
         border: bool = False,
+        items: Optional[list] = None,
     ):
         """
         Renders a form to select an object of this class to update.
@@ -217,10 +518,13 @@ class StreamlitAlchemyMixin(mixin_parent):
         :param filter_by: A dictionary of keyword arguments to filter by.
         :param except_columns: A list of column names to exclude from the form.
         :param border: Whether or not to display a border around the form.
+        :param items: The objects to select from, already listed with filter_by.
         """
+        if items is None:
+            items = cls.st_list_all(filter_by=filter_by)
         selected_obj_to_update = st.selectbox(
             f"Select {cls.st_pretty_class()} to Update",
-            cls.st_list_all(filter_by=filter_by),
+            items,
             index=None,
             format_func=lambda obj: _st_repr(obj),
         )
@@ -233,25 +537,35 @@ class StreamlitAlchemyMixin(mixin_parent):
 
     @classmethod
     def st_delete_select_form(
-        cls, filter_by: Optional[dict] = None, *, border: bool = False
+        cls,
+        filter_by: Optional[dict] = None,
+        *,
+        border: bool = False,
+        items: Optional[list] = None,
     ):
         """
         Renders a form to select an object of this class to delete.
 
         :param filter_by: A dictionary of keyword arguments to filter by.
         :param border: Whether or not to display a border around the form.
+        :param items: The objects to select from, already listed with filter_by.
         """
+        if items is None:
+            items = cls.st_list_all(filter_by=filter_by)
         selected_obj_to_delete = st.selectbox(
             f"Select {cls.st_pretty_class()} to Delete",
-            cls.st_list_all(filter_by=filter_by),
+            items,
             index=None,
             format_func=lambda obj: _st_repr(obj),
         )
         if selected_obj_to_delete:
             with st.form(f"delete_{cls.__name__}", clear_on_submit=True, border=border):
-                if st.form_submit_button(f"Delete {cls.st_pretty_class()}"):
-                    selected_obj_to_delete._st_session_delete()
-                    st.rerun()
+                # deleting in the callback, before the rerun triggered by the
+                # submit, avoids a second full rerun to refresh the selectbox
+                st.form_submit_button(
+                    f"Delete {cls.st_pretty_class()}",
+                    on_click=selected_obj_to_delete._st_session_delete,
+                )
 
     @classmethod
     def st_crud_tabs(
@@ -283,14 +597,19 @@ class StreamlitAlchemyMixin(mixin_parent):
                 f"Delete {cls.st_pretty_class()}",
             ]
         )
+        # listed once for both select forms
+        items = cls.st_list_all(filter_by=filter_by)
         with create_tab:
             cls.st_create_form(defaults=defaults, border=border)
         with update_tab:
             cls.st_update_select_form(
-                filter_by=filter_by, except_columns=except_columns, border=border
+                filter_by=filter_by,
+                except_columns=except_columns,
+                border=border,
+                items=items,
             )
         with delete_tab:
-            cls.st_delete_select_form(filter_by=filter_by, border=border)
+            cls.st_delete_select_form(filter_by=filter_by, border=border, items=items)
 
     @classmethod
     def _st_get_default_input_function(cls, column) -> Optional[InputFunction]:
@@ -300,55 +619,80 @@ class StreamlitAlchemyMixin(mixin_parent):
 
         :param column: The column to get the default input for.
         """
+        return cls._st_input_meta.get(column.name)
 
-        if hasattr(cls, "__st_input_meta__"):
-            return cls.__st_input_meta__.get(column.name)  # type: ignore
+    @classmethod
+    def _st_get_input_function(cls, spec: ColumnSpec) -> InputFunction:
+        """
+        Returns an input function for the column of the given spec, built
+        once per class and column.
+        """
+        input_functions = cls.__dict__.get("_st_input_functions_cache")
+        if input_functions is None:
+            input_functions = cls._st_input_functions_cache = {}
 
-        return None
+        input_function = input_functions.get(spec.name)
+        if input_function is None:
+            input_function = cls._st_build_input_function(spec)
+            input_functions[spec.name] = input_function
+        return input_function
 
     @classmethod
-    def _st_get_input_function(cls, column) -> InputFunction:
+    def _st_build_input_function(cls, spec: ColumnSpec) -> InputFunction:
         """
-        Returns an input function for the given column.
+        Builds the input function for the column of the given spec.
         """
+        column = spec.column
         default_input = cls._st_get_default_input_function(column)
         if default_input is not None:
             return default_input
 
-        def get_default_value(column, default=None):
-            return column.default.arg if column.default else default
+        kind, default = spec.kind, spec.default
 
-        if column.foreign_keys:
-            # create a new set and pop the only element
-            foreign_table_name = set(column.foreign_keys).pop().column.table.name
+        if kind == "foreign_key":
+            # a column references a single foreign key
+            foreign_table_name = next(iter(column.foreign_keys)).column.table.name
 
             class_ = cls._st_get_class_by_tablename(foreign_table_name)
 
-            conn = cls.st_get_connection()
-            with conn.session as session:
-                choices = session.query(class_).all()  # type: ignore
-
-            choices.sort(key=_st_order_by)
-
             def selectbox(label, value=None):
+                # read on each render from the cache, the same list as
+                # st_list_all, so the foreign keys and the select forms of
+                # the same table share one query per page
+                all_choices = cls._st_list_all_of(class_)
+                truncated = len(all_choices) > _ST_MAX_CHOICES
+                choices = all_choices[:_ST_MAX_CHOICES]
                 index = None
                 if value is not None:
                     # value should be an id
-                    index = next(choices.index(c) for c in choices if c.id == value)
-
-                return st.selectbox(
+                    index = next(
+                        (i for i, c in enumerate(choices) if c.id == value), None
+                    )
+                    if index is None:
+                        # beyond the listed choices, add the selected object
+                        selected = [c for c in all_choices if c.id == value]
+                        if selected:
+                            choices = selected + choices
+                            index = 0
+
+                selected = st.selectbox(
                     label,
                     index=index,
                     options=choices,
                     format_func=_st_repr,
                     help=column.doc,
                 )
+                if truncated:
+                    st.caption(
+                        f"Only the first {_ST_MAX_CHOICES} rows of "
+                        f"{_st_pretty_class_name(class_)} are listed."
+                    )
+                return selected
 
             return selectbox
 
-        if isinstance(column.type, Enum):
+        if kind == "enum":
             options = [o for o in column.type._object_lookup.values() if o is not None]
-            default = get_default_value(column, default=options[0])
 
             def enum_selectbox(label, value=None):
                 value = value if value is not None else default
@@ -357,8 +701,7 @@ class StreamlitAlchemyMixin(mixin_parent):
 
             return enum_selectbox
 
-        if isinstance(column.type, SqlInteger):
-            default = get_default_value(column, default=0)
+        if kind == "integer":
 
             def number_input(label, value=None):
                 value = value if value is not None else default
@@ -366,8 +709,7 @@ class StreamlitAlchemyMixin(mixin_parent):
 
             return number_input
 
-        if isinstance(column.type, Float):
-            default = get_default_value(column, default=0.0)
+        if kind == "float":
 
             def float_input(label, value=None):
                 value = value if value is not None else default
@@ -375,8 +717,7 @@ class StreamlitAlchemyMixin(mixin_parent):
 
             return float_input
 
-        if isinstance(column.type, Boolean):
-            default = get_default_value(column)
+        if kind == "boolean":
 
             def boolean_select(label, value=None):
                 options = [True, False]
@@ -388,11 +729,11 @@ class StreamlitAlchemyMixin(mixin_parent):
 
             return boolean_select
 
-        if isinstance(column.type, DateTime):
-            default = get_default_value(column, default=datetime.now())
+        if kind == "datetime":
 
             def datetime_input(label, value=None):
                 value = value if value is not None else default
+                value = value if value is not None else datetime.now()
                 value_date = value.date()
                 value_time = value.time().replace(minute=0, second=0, microsecond=0)
 
@@ -409,27 +750,26 @@ class StreamlitAlchemyMixin(mixin_parent):
 
             return datetime_input
 
-        if isinstance(column.type, Date):
-            default = get_default_value(column, default=date.today())
+        if kind == "date":
 
             def date_input(label, value=None):
                 value = value if value is not None else default
+                value = value if value is not None else date.today()
                 return st.date_input(label, value=value, help=column.doc)
 
             return date_input
 
-        if isinstance(column.type, Time):
-            default = get_default_value(column, default=datetime.now().time())
+        if kind == "time":
 
             def time_input(label, value=None):
                 value = value if value is not None else default
+                value = value if value is not None else datetime.now().time()
                 value = value.replace(minute=0, second=0, microsecond=0)
                 return st.time_input(label, value=value, help=column.doc)
 
             return time_input
 
-        default = get_default_value(column, default="")
-        if isinstance(column.type, Text):
+        if kind == "text":
 
             def text_area(label, value=None):
                 value = value if value is not None else default
@@ -443,6 +783,43 @@ class StreamlitAlchemyMixin(mixin_parent):
 
         return text_input
 
+    @classmethod
+    def _st_column_specs(cls) -> tuple[ColumnSpec, ...]:
+        """
+        Returns the specs of the columns rendered in the forms, i.e. all
+        but the id, built once per class instead of once per rerun.
+        """
+        specs = cls.__dict__.get("_st_column_specs_cache")
+        if specs is None:
+            specs = tuple(
+                ColumnSpec(
+                    column.name,
+                    _get_pretty_column_name(column.name),
+                    column,
+                    *_st_column_input_kind(column),
+                )
+                for column in cls.__table__.columns
+                if column.name != "id"
+            )
+            cls._st_column_specs_cache = specs
+        return specs
+
+    @classmethod
+    def _st_foreign_key_names(cls) -> tuple[str, ...]:
+        """
+        Returns the names of the foreign key columns, whose inputs return
+        the selected object instead of its id.
+        """
+        names = cls.__dict__.get("_st_foreign_key_names_cache")
+        if names is None:
+            names = tuple(
+                spec.name
+                for spec in cls._st_column_specs()
+                if spec.kind == "foreign_key"
+            )
+            cls._st_foreign_key_names_cache = names
+        return names
+
     @classmethod
     def _st_get_class_by_tablename(cls, tablename: str):
         """
@@ -454,17 +831,49 @@ class StreamlitAlchemyMixin(mixin_parent):
         :param tablename: String with name of table.
         :return: Class reference or None.
         """
-        for c in cls.registry._class_registry.values():
-            if hasattr(c, "__tablename__") and getattr(c, "__tablename__") == tablename:
-                return c
-        raise RuntimeError(f"Class with tablename {tablename} not found")
+        class_registry = cls.registry._class_registry
+        size, index = _st_tablename_index.get(cls.registry, (-1, {}))
+        if size != len(class_registry):
+            # rebuilt only when a class was added to the registry
+            index = {
+                c.__tablename__: c
+                for c in class_registry.values()
+                if hasattr(c, "__tablename__")
+            }
+            _st_tablename_index[cls.registry] = (len(class_registry), index)
+
+        try:
+            return index[tablename]
+        except KeyError:
+            raise RuntimeError(f"Class with tablename {tablename} not found")
+
+    @classmethod
+    def _st_list_all_of(
+        cls,
+        class_: type[DeclarativeBase],
+        filter_by: Optional[dict] = None,
+    ) -> list:
+        """
+        Returns the objects of the given class, which does not have to use
+        the mixin, through the cached query of st_list_all.
+        """
+        filter_by = filter_by or {}
+        conn = cls.st_get_connection()
+        return _st_cached_list_all(
+            class_,
+            conn,
+            f"{class_.__module__}.{class_.__qualname__}",
+            _st_data_version,
+            filter_by,
+            _st_filter_key(filter_by),
+        )
 
     @classmethod
     def _st_is_initialized(cls) -> bool:
         """
         Returns whether or not the engine is initialized.
         """
-        return hasattr(cls, "__connection")
+        return cls.__connection is not None
 
     @classmethod
     def _st_create(cls, **kwargs) -> None:
@@ -472,39 +881,160 @@ class StreamlitAlchemyMixin(mixin_parent):
         Creates a new object of this class.
         """
         obj = cls(**kwargs)
-        conn = cls.st_get_connection()
-        with conn.session as session, session.begin():
-            try:
+        # the INSERT is flushed on commit, when leaving the with block
+        try:
+            with cls._st_session() as session, session.begin():
                 session.add(obj)
-            except IntegrityError as e:
-                logging.exception(
-                    f"*Error creating {cls.st_pretty_class()} {_st_repr(obj)}!*\n\n{e.orig}"
-                )
-            else:
-                logging.info(f"{cls.st_pretty_class()} Added")
+        except IntegrityError as e:
+            logger.exception(
+                f"*Error creating {cls.st_pretty_class()} {_st_repr(obj)}!*\n\n{e.orig}"
+            )
+        else:
+            logger.info(f"{cls.st_pretty_class()} Added")
+            _st_invalidate_cache()
+
+    @classmethod
+    def st_create_many(cls, rows: list[dict], batch_size: int = 500) -> int:
+        """
+        Creates several objects of this class at once, with one INSERT
+        statement executed per batch of rows instead of one per object,
+        all in the same transaction.
+
+        If a row breaks a constraint, the rows are inserted again one by
+        one and the failing ones are skipped.
+
+        :param rows: A list of dictionaries of column values, one per object.
+        :param batch_size: The number of rows sent with each statement.
+        :return: The number of objects created.
+
+        Example:
+        ```
+        User.st_create_many([{"name": "John Doe"}, {"name": "Jane Doe"}])
+        ```
+        """
+        if not rows:
+            return 0
+
+        try:
+            with cls._st_session() as session, session.begin():
+                for start in range(0, len(rows), batch_size):
+                    session.execute(insert(cls), rows[start : start + batch_size])
+            created = len(rows)
+        except IntegrityError as e:
+            logger.warning(
+                f"*Error creating {len(rows)} {cls.st_pretty_class()}, "
+                f"retrying row by row!*\n\n{e.orig}"
+            )
+            created = cls._st_create_rows_one_by_one(rows)
+
+        if created:
+            logger.info(f"{created} {cls.st_pretty_class()} Added")
+            _st_invalidate_cache()
+        return created
+
+    @classmethod
+    def _st_create_rows_one_by_one(cls, rows: list[dict]) -> int:
+        """
+        Inserts the rows in a savepoint each, skipping the ones that raise
+        an IntegrityError, and returns the number of rows inserted.
+        """
+        created = 0
+        with cls._st_session() as session, session.begin():
+            for row in rows:
+                try:
+                    with session.begin_nested():
+                        session.execute(insert(cls), [row])
+                except IntegrityError as e:
+                    logger.exception(
+                        f"*Error creating {cls.st_pretty_class()} {row}!*\n\n{e.orig}"
+                    )
+                else:
+                    created += 1
+        return created
+
+    @classmethod
+    def st_update_many(cls, rows: list[dict], batch_size: int = 500) -> None:
+        """
+        Updates several objects of this class at once, with one UPDATE
+        statement per batch of rows instead of one per object, all in the
+        same transaction. Each row must contain the id of the object, and
+        only the columns given in a row are changed for it.
+
+        :param rows: A list of dictionaries of column values, with the id.
+        :param batch_size: The number of rows updated by each statement.
+
+        Example:
+        ```
+        User.st_update_many([{"id": 1, "active": False}, {"id": 2, "name": "Bob"}])
+        ```
+        """
+        if not rows:
+            return
+
+        table = cls.__table__
+        try:
+            with cls._st_session() as session, session.begin():
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start : start + batch_size]
+                    values = {}
+                    for row in batch:
+                        for name, value in row.items():
+                            if name != "id":
+                                values.setdefault(name, {})[row["id"]] = value
+                    if not values:
+                        continue
+                    # SET col = CASE id WHEN ... THEN ... ELSE col END, the
+                    # values are bound with the type of their column so that
+                    # enums, booleans and dates are converted as usual
+                    session.execute(
+                        update(table)
+                        .where(table.c.id.in_([row["id"] for row in batch]))
+                        .values(
+                            {
+                                name: case(
+                                    {
+                                        pk: literal(value, table.c[name].type)
+                                        for pk, value in by_id.items()
+                                    },
+                                    value=table.c.id,
+                                    else_=table.c[name],
+                                )
+                                for name, by_id in values.items()
+                            }
+                        )
+                    )
+        except IntegrityError as e:
+            logger.exception(
+                f"*Error updating {len(rows)} {cls.st_pretty_class()}!*\n\n{e.orig}"
+            )
+        else:
+            logger.info(f"{len(rows)} {cls.st_pretty_class()} Updated")
+            _st_invalidate_cache()
 
     @classmethod
     def _st_update(cls, **kwargs) -> None:
         """
-        Updates an existing object of this class.
+        Updates an existing object of this class, only the given columns
+        are written.
         """
-        obj = cls(**kwargs)
-        conn = cls.st_get_connection()
-        with conn.session as session, session.begin():
-            try:
-                session.query(cls).filter_by(id=obj.id).update(
-                    {
-                        column.name: getattr(obj, column.name)
-                        for column in obj.__table__.columns
-                        if column.name != "id"
-                    }
-                )
-            except IntegrityError as e:
-                logging.exception(
-                    f"*Error updating {cls.st_pretty_class()} {_st_repr(obj)}!*\n\n{e.orig}"
+        values = dict(kwargs)
+        pk = values.pop("id")
+        if not values:
+            return
+
+        try:
+            with cls._st_session() as session, session.begin():
+                # the session is new, there is no loaded object to synchronize
+                session.query(cls).filter_by(id=pk).update(
+                    values, synchronize_session=False
                 )
-            else:
-                logging.info(f"{cls.st_pretty_class()} Updated")
+        except IntegrityError as e:
+            logger.exception(
+                f"*Error updating {cls.st_pretty_class()} {pk}!*\n\n{e.orig}"
+            )
+        else:
+            logger.info(f"{cls.st_pretty_class()} Updated")
+            _st_invalidate_cache()
 
     def st_edit_button(self, label: str, values: dict[str, Any], **kwargs) -> bool:
         """
@@ -563,79 +1093,82 @@ class StreamlitAlchemyMixin(mixin_parent):
         with st.form(
             f"update_{self.__class__.__name__}_{self.id}_{unique_hash}", border=border
         ):
-            kwargs = {
-                column.name: getattr(self, column.name)
-                for column in self.__table__.columns
-            }
-            for column in self.__table__.columns:
-                if column.name == "id":
-                    continue
-
-                if column.name in except_columns:
+            kwargs = {"id": self.id}
+            for spec in self._st_column_specs():
+                value = getattr(self, spec.name)
+                if spec.name in except_columns:
+                    kwargs[spec.name] = value
                     continue
 
-                input_function = self._st_get_input_function(column)
-                kwargs.update(
-                    {
-                        column.name: input_function(
-                            _get_pretty_column_name(column.name),
-                            value=kwargs[column.name],
-                        )
-                    }
-                )
+                input_function = self._st_get_input_function(spec)
+                kwargs[spec.name] = input_function(spec.label, value=value)
 
             submitted = st.form_submit_button(f"Update {self.st_pretty_class()}")
             if submitted:
-                for field in set(kwargs) - set(except_columns):
-                    if field.endswith("_id") and kwargs[field]:
-                        kwargs[field] = kwargs[field].id
-                self._st_update(**kwargs)
+                for field in self._st_foreign_key_names():
+                    if field not in except_columns:
+                        kwargs[field] = _st_object_id(kwargs[field])
+                # only the modified columns are sent in the UPDATE
+                self._st_update(
+                    **{
+                        name: value
+                        for name, value in kwargs.items()
+                        if name == "id" or value != getattr(self, name)
+                    }
+                )
         return submitted
 
-    def _get_first_column_name(self, cls: type[DeclarativeBase]) -> Optional[str]:
-        """
-        Returns the first column name of the given class.
-        """
-        for col in cls.__mapper__._all_column_expressions:
-            if col.name != "id":
-                return col.name
-
     def _st_session_delete(self):
         """
         Deletes this object from the session.
         """
-        conn = self.st_get_connection()
-        with conn.session as session, session.begin():
-            try:
-                session.delete(self)
-            except IntegrityError as e:
-                logging.exception(
-                    f"*Error deleting {self.st_pretty_class()} {_st_repr(self)}!*\n\n{e.orig}"
-                )
-            else:
-                logging.info(f"{self.st_pretty_class()} Deleted")
+        cls = type(self)
+        try:
+            with self._st_session() as session, session.begin():
+                if inspect(cls).relationships:
+                    # let the unit of work apply the relationship cascades,
+                    # the DELETE is flushed on commit
+                    session.delete(self)
+                else:
+                    session.execute(
+                        delete(cls.__table__).where(cls.__table__.c.id == self.id)
+                    )
+        except IntegrityError as e:
+            logger.exception(
+                f"*Error deleting {self.st_pretty_class()} {_st_repr(self)}!*\n\n{e.orig}"
+            )
+        else:
+            logger.info(f"{self.st_pretty_class()} Deleted")
+            _st_invalidate_cache()
 
     def _st_session_update(self):
         """
         Updates this object in the session.
-        This is not the same as the st_update method, which creates
-        a new object and replaces the old one.
+        This is not the same as the _st_update method, which writes the
+        given values to the row with the given id.
         """
-        conn = self.st_get_connection()
-        with conn.session as session, session.begin():
-            try:
+        # only the attributes set since the object was loaded are written
+        attrs = inspect(self).attrs
+        values = {
+            spec.name: getattr(self, spec.name)
+            for spec in self._st_column_specs()
+            if attrs[spec.name].history.has_changes()
+        }
+        if not values:
+            return
+
+        try:
+            with self._st_session() as session, session.begin():
                 session.query(self.__class__).filter_by(id=self.id).update(
-                    {
-                        column.name: getattr(self, column.name)
-                        for column in self.__table__.columns
-                    }
-                )
-            except IntegrityError as e:
-                logging.exception(
-                    f"*Error updating {self.st_pretty_class()} {_st_repr(self)}!*\n\n{e.orig}"
+                    values, synchronize_session=False
                 )
-            else:
-                logging.info(f"{self.st_pretty_class()} Updated")
+        except IntegrityError as e:
+            logger.exception(
+                f"*Error updating {self.st_pretty_class()} {_st_repr(self)}!*\n\n{e.orig}"
+            )
+        else:
+            logger.info(f"{self.st_pretty_class()} Updated")
+            _st_invalidate_cache()
 
     def __st_ensure_initialized(self):
         """
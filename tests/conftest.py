@@ -1,29 +1,67 @@
-import os
-import tempfile
-
 import pytest
 import streamlit as st
-from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
 
 from streamlit_sqlalchemy import StreamlitAlchemyMixin
-from tests.objects import Base
+from tests.objects import SEED_ITEMS, Base, Item, OneToMany
 
 
-@pytest.fixture
-def database():
-    temp_dir = tempfile.mkdtemp()
-    db_path = os.path.join(temp_dir, "test.sqlite")
-    db_url = f"sqlite:///{db_path}"
-    engine = create_engine(db_url)
-    Base.metadata.create_all(engine)
-    connection = st.connection("test", type="sql", url=db_url)
-    StreamlitAlchemyMixin.st_initialize(connection)
+@pytest.fixture(scope="session")
+def _connection():
+    # a single in-memory database shared by the test and the AppTest threads
+    connection = st.connection(
+        "test",
+        type="sql",
+        url="sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    # initialize before the first connect so the sqlite pragmas are applied
+    # to the only connection of the pool
+    StreamlitAlchemyMixin.st_initialize(connection, sqlite_pragmas=True)
+    Base.metadata.create_all(connection.engine)
 
     yield connection
 
     # Cleanup
-    try:
-        os.remove(db_path)
-        os.rmdir(temp_dir)
-    except (OSError, FileNotFoundError):
-        pass
+    connection.engine.dispose()
+
+
+@pytest.fixture
+def database(_connection):
+    yield _connection
+
+    # empty the tables for the next test, the rows were committed by the
+    # mixin's own sessions so there is no outer transaction to roll back
+    with _connection.session as session, session.begin():
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+    # the deletes did not go through the mixin, drop the cached listings
+    st.cache_data.clear()
+
+
+@pytest.fixture
+def add_all(database):
+    """
+    Returns a function inserting the given objects with a plain session,
+    so that the data of a test does not depend on the writes of the mixin.
+    """
+
+    def add_all(*objects):
+        with database.session as session:
+            session.add_all(objects)
+            session.commit()
+        # the inserts did not go through the mixin, drop the cached listings
+        st.cache_data.clear()
+
+    return add_all
+
+
+@pytest.fixture
+def seeded_items(database, add_all):
+    add_all(
+        *(Item(**row) for row in SEED_ITEMS),
+        OneToMany(first_field="FF", test_item_id=None),
+    )
+
+    yield database
@@ -37,6 +37,8 @@ class OneToMany(Base, StreamlitAlchemyMixin):
 
     test_item = relationship("Item", backref="one_to_many")
 
+    __st_eager__ = ("test_item",)
+
 
 class SuperItem(Base, StreamlitAlchemyMixin):
     __tablename__ = "super_item"
@@ -82,3 +84,35 @@ class AdvancedObject(Base, StreamlitAlchemyMixin):
         "another_string": st.text_area,
         "my_other_bool": lambda *a, **kw: st.checkbox(*a, **kw, value=True),
     }
+
+
+class Company(Base, StreamlitAlchemyMixin):
+    """Without any relationship (no backref from Employee)."""
+
+    __tablename__ = "company"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class Employee(Base, StreamlitAlchemyMixin):
+    __tablename__ = "employee"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    company_id = Column(Integer, ForeignKey("company.id"))
+    manager_id = Column(Integer, ForeignKey("employee.id"))
+
+    company = relationship("Company")
+    manager = relationship("Employee", remote_side=[id])
+
+    # the manager is another row of the same table
+    __st_eager__ = ("company", "manager.company")
+
+
+# the items seeded by several tests, deliberately not in alphabetical order
+SEED_ITEMS = [
+    {"name": "A", "count": 1},
+    {"name": "C", "count": 2},
+    {"name": "B", "count": 3},
+]
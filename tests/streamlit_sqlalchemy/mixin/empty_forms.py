@@ -0,0 +1,8 @@
+from tests.objects import Item, OneToMany
+
+Item.st_create_form()
+OneToMany.st_create_form()
+Item.st_update_select_form()
+OneToMany.st_update_select_form()
+Item.st_delete_select_form()
+OneToMany.st_delete_select_form()
@@ -1,12 +1,77 @@
-from streamlit.testing.v1 import AppTest
-from tests.objects import Item, OneToMany, SuperItem
-
+from datetime import datetime
 
-def test_create_form_no_items(database):
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/create_form.py",
-        default_timeout=10,
-    ).run(timeout=10)
+import pytest
+import streamlit as st
+from sqlalchemy import Column, Integer, String, event, inspect, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, declarative_base
+from streamlit.testing.v1 import AppTest
+from streamlit_sqlalchemy import StreamlitAlchemyMixin
+from streamlit_sqlalchemy.mixin import _st_order_by, _st_repr, _st_set_sqlite_pragmas
+from tests.objects import (
+    SEED_ITEMS,
+    AdvancedObject,
+    Company,
+    Employee,
+    Item,
+    OneToMany,
+    SimpleEnum,
+    SuperItem,
+)
+
+_SCRIPTS_DIR = "tests/streamlit_sqlalchemy/mixin"
+
+# seeded items and one to many, with the options expected in the selectboxes
+# of the update and delete select forms
+_SELECT_FORM_CASES = [
+    ([{"name": "Test", "count": 1}], [], ["Test"], []),
+    (
+        SEED_ITEMS,
+        [{"first_field": "FF", "test_item_id": None}],
+        ["A", "B", "C"],
+        ["FF"],
+    ),
+]
+
+
+def _app_test(script: str) -> AppTest:
+    """Run one of the scripts of the mixin directory."""
+    return AppTest.from_file(f"{_SCRIPTS_DIR}/{script}").run()
+
+
+def test_forms_no_items(database):
+    at = _app_test("empty_forms.py")
+
+    # create forms
+    assert [w.label for w in at.text_input] == ["Name", "First Field"]
+    assert [w.label for w in at.number_input] == ["Count"]
+    assert [b.label for b in at.button] == ["Create Item", "Create One To Many"]
+
+    # create, update select and delete select forms
+    assert [w.label for w in at.selectbox] == [
+        "Test Item",
+        "Select Item to Update",
+        "Select One To Many to Update",
+        "Select Item to Delete",
+        "Select One To Many to Delete",
+    ]
+    assert all(w.options == [] for w in at.selectbox)
+
+
+@pytest.mark.parametrize(
+    "items, expected_options",
+    [
+        ([{"name": "Test", "count": 1}], ["Test"]),
+        (
+            [{"name": "Test", "count": 1}, {"name": "Test2", "count": 2}],
+            ["Test", "Test2"],
+        ),
+    ],
+)
+def test_create_form(add_all, items, expected_options):
+    add_all(*(Item(**row) for row in items))
+
+    at = _app_test("create_form.py")
 
     # first form
     assert at.text_input[0].label == "Name"
@@ -16,138 +81,77 @@ def test_create_form_no_items(database):
     # second form
     assert at.text_input[1].label == "First Field"
     assert at.selectbox[0].label == "Test Item"
-    assert at.selectbox[0].options == []
-    assert at.button[1].label == "Create One To Many"
-
-
-def test_create_form_one_item(database):
-    # create item
-    Item._st_create(name="Test", count=1)
-
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/create_form.py",
-        default_timeout=10,
-    ).run(timeout=10)
-
-    # second form
-    assert at.text_input[1].label == "First Field"
-    assert at.selectbox[0].label == "Test Item"
-    assert at.selectbox[0].options == ["Test"]
-    assert at.button[1].label == "Create One To Many"
-
-
-def test_create_form_two_items(database):
-    # create item
-    Item._st_create(name="Test", count=1)
-    Item._st_create(name="Test2", count=2)
-
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/create_form.py",
-        default_timeout=10,
-    ).run(timeout=10)
-
-    # second form
-    assert at.text_input[1].label == "First Field"
-    assert at.selectbox[0].label == "Test Item"
-    assert at.selectbox[0].options == ["Test", "Test2"]
+    assert at.selectbox[0].options == expected_options
     assert at.button[1].label == "Create One To Many"
 
 
-def test_create_form_advanced(database):
-    SuperItem._st_create(name="Test", count=1)
-    SuperItem._st_create(name="Test2", count=3)
-    SuperItem._st_create(name="Test3", count=2)
+def test_create_form_truncated_choices(add_all, monkeypatch):
+    monkeypatch.setattr("streamlit_sqlalchemy.mixin._ST_MAX_CHOICES", 2)
+    add_all(*(Item(name=name, count=1) for name in ("A", "B", "C")))
 
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/create_form_advanced.py",
-        default_timeout=10,
-    ).run(timeout=10)
+    at = _app_test("create_form.py")
 
-    assert len(at.text_input) == 1
-    assert at.text_input[0].label == "Name"
+    assert at.selectbox[0].options == ["A", "B"]
+    assert [c.value for c in at.caption] == [
+        "Only the first 2 rows of Item are listed."
+    ]
 
-    assert len(at.text_area) == 2
-    assert at.text_area[0].label == "Another String"
-    assert at.text_area[1].label == "Text"
 
-    assert len(at.number_input) == 2
-    assert at.number_input[0].label == "Count"
-    assert at.number_input[0].step == 1
-    assert at.number_input[1].label == "My Float"
-    assert at.number_input[1].step == 0.1
+def test_create_form_advanced(add_all):
+    add_all(
+        SuperItem(name="Test", count=1),
+        SuperItem(name="Test2", count=3),
+        SuperItem(name="Test3", count=2),
+    )
 
-    assert len(at.date_input) == 2
-    assert at.date_input[0].label == "Due Datetime"
-    assert at.date_input[1].label == "Creating Date"
+    at = _app_test("create_form_advanced.py")
 
-    assert len(at.time_input) == 2
-    assert at.time_input[0].label == "Due Datetime"
-    assert at.time_input[1].label == "Closing Time"
+    assert [w.label for w in at.text_input] == ["Name"]
+    assert [w.label for w in at.text_area] == ["Another String", "Text"]
+    assert [(w.label, w.step) for w in at.number_input] == [
+        ("Count", 1),
+        ("My Float", 0.1),
+    ]
+    assert [w.label for w in at.date_input] == ["Due Datetime", "Creating Date"]
+    assert [w.label for w in at.time_input] == ["Due Datetime", "Closing Time"]
 
-    assert len(at.selectbox) == 3
-    assert at.selectbox[0].label == "My Enum"
+    assert [w.label for w in at.selectbox] == ["My Enum", "My Bool", "Super Item"]
     assert at.selectbox[0].options == ["First", "Second", "Third", "None"]
-    assert at.selectbox[1].label == "My Bool"
     assert at.selectbox[1].options == ["True", "False"]
-    assert at.selectbox[2].label == "Super Item"
     assert at.selectbox[2].options == ["Test (1)", "Test3 (2)", "Test2 (3)"]
 
-    assert len(at.checkbox) == 1
-    assert at.checkbox[0].label == "My Other Bool"
-    assert at.checkbox[0].value is True
+    assert [(w.label, w.value) for w in at.checkbox] == [("My Other Bool", True)]
 
     assert at.button[0].label == "Create Advanced Object"
 
 
-def test_update_select_form_no_items(database):
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/update_select_form.py",
-        default_timeout=10,
-    ).run(timeout=10)
-
-    # first form
-    assert at.selectbox[0].label == "Select Item to Update"
-    assert at.selectbox[0].options == []
-    assert len(at.button) == 0
-
-    # second form
-    assert at.selectbox[1].label == "Select One To Many to Update"
-    assert at.selectbox[1].options == []
-    assert len(at.button) == 0
-
-
-def test_update_select_form_one_item(database):
-    # create item
-    Item._st_create(name="Test", count=1)
+@pytest.mark.parametrize(
+    "items, one_to_many, expected_items, expected_one_to_many", _SELECT_FORM_CASES
+)
+def test_update_select_form(
+    add_all, items, one_to_many, expected_items, expected_one_to_many
+):
+    add_all(*(Item(**row) for row in items))
+    add_all(*(OneToMany(**row) for row in one_to_many))
 
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/update_select_form.py",
-        default_timeout=10,
-    ).run(timeout=10)
+    at = _app_test("update_select_form.py")
 
     # first form
     assert at.selectbox[0].label == "Select Item to Update"
-    assert at.selectbox[0].options == ["Test"]
+    assert at.selectbox[0].options == expected_items
 
     # second form
     assert at.selectbox[1].label == "Select One To Many to Update"
-    assert at.selectbox[1].options == []
+    assert at.selectbox[1].options == expected_one_to_many
     assert len(at.button) == 0
 
 
-def test_update_form_one_item(database):
-    # create item
-    Item._st_create(name="A", count=1)
-    Item._st_create(name="C", count=2)
-    Item._st_create(name="B", count=3)
-    database.session.commit()
+def test_update_form_one_item(add_all):
+    add_all(*(Item(**row) for row in SEED_ITEMS))
     first_item = next(i for i in Item.st_list_all() if i.name == "B")  # type: ignore
-    OneToMany._st_create(first_field="FF", test_item_id=first_item.id)
+    add_all(OneToMany(first_field="FF", test_item_id=first_item.id))
 
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/update_form.py",
-        default_timeout=10,
-    ).run(timeout=10)
+    at = _app_test("update_form.py")
 
     # first form
     assert at.text_input[0].label == "Name"
@@ -162,19 +166,12 @@ def test_update_form_one_item(database):
     assert at.button[1].label == "Update One To Many"
 
 
-def test_update_form_one_item_except_m2o(database):
-    # create item
-    Item._st_create(name="A", count=1)
-    Item._st_create(name="C", count=2)
-    Item._st_create(name="B", count=3)
-    database.session.commit()
+def test_update_form_one_item_except_m2o(add_all):
+    add_all(*(Item(**row) for row in SEED_ITEMS))
     first_item = next(i for i in Item.st_list_all() if i.name == "B")  # type: ignore
-    OneToMany._st_create(first_field="FF", test_item_id=first_item.id)
+    add_all(OneToMany(first_field="FF", test_item_id=first_item.id))
 
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/update_form_except_m2o.py",
-        default_timeout=10,
-    ).run(timeout=10)
+    at = _app_test("update_form_except_m2o.py")
 
     # first form
     assert at.text_input[0].label == "Name"
@@ -187,105 +184,222 @@ def test_update_form_one_item_except_m2o(database):
     assert at.button[1].label == "Update One To Many"
 
 
-def test_update_select_form_several_items(database):
-    # create item
-    Item._st_create(name="A", count=1)
-    Item._st_create(name="C", count=2)
-    Item._st_create(name="B", count=3)
-
-    OneToMany._st_create(first_field="FF", test_item_id=None)
+@pytest.mark.parametrize(
+    "items, one_to_many, expected_items, expected_one_to_many", _SELECT_FORM_CASES
+)
+def test_delete_select_form(
+    add_all, items, one_to_many, expected_items, expected_one_to_many
+):
+    add_all(*(Item(**row) for row in items))
+    add_all(*(OneToMany(**row) for row in one_to_many))
 
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/update_select_form.py",
-        default_timeout=10,
-    ).run(timeout=10)
+    at = _app_test("delete_form.py")
 
     # first form
-    assert at.selectbox[0].label == "Select Item to Update"
-    assert at.selectbox[0].options == ["A", "B", "C"]
+    assert at.selectbox[0].label == "Select Item to Delete"
+    assert at.selectbox[0].options == expected_items
 
     # second form
-    assert at.selectbox[1].label == "Select One To Many to Update"
-    assert at.selectbox[1].options == ["FF"]
+    assert at.selectbox[1].label == "Select One To Many to Delete"
+    assert at.selectbox[1].options == expected_one_to_many
     assert len(at.button) == 0
 
 
-def test_delete_form_no_items(database):
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/delete_form.py",
-        default_timeout=10,
-    ).run(timeout=10)
+def test_delete_button_several_items(seeded_items):
+    at = _app_test("delete_button.py")
 
     # first form
-    assert at.selectbox[0].label == "Select Item to Delete"
-    assert at.selectbox[0].options == []
-    assert len(at.button) == 0
+    assert [b.label for b in at.button] == ["Delete", "Delete", "Delete", "Delete OTM"]
 
-    # second form
-    assert at.selectbox[1].label == "Select One To Many to Delete"
-    assert at.selectbox[1].options == []
-    assert len(at.button) == 0
+
+def test_edit_button(seeded_items):
+    at = _app_test("edit_button.py")
+
+    # first form
+    assert [b.label for b in at.button] == ["Add 1", "Add 1", "Add 1"]
 
 
-def test_delete_form_several_items(database):
-    # create item
+def test_list_all_eager(database):
     Item._st_create(name="A", count=1)
-    Item._st_create(name="C", count=2)
-    Item._st_create(name="B", count=3)
+    item = Item.st_list_all()[0]
+    OneToMany._st_create(first_field="FF", test_item_id=item.id)
+    OneToMany._st_create(first_field="GG", test_item_id=None)
 
-    OneToMany._st_create(first_field="FF", test_item_id=None)
+    # the relationship is loaded with the list, so it is still
+    # available once the session is closed
+    assert [o.test_item and o.test_item.name for o in OneToMany.st_list_all()] == [
+        "A",
+        None,
+    ]
 
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/delete_form.py",
-        default_timeout=10,
-    ).run(timeout=10)
 
-    # first form
-    assert at.selectbox[0].label == "Select Item to Delete"
-    assert at.selectbox[0].options == ["A", "B", "C"]
+def test_list_all_eager_chain_after_self_reference(add_all):
+    add_all(Company(id=1, name="Boss Co"), Company(id=2, name="Staff Co"))
+    add_all(Employee(id=1, name="Boss", company_id=1))
+    add_all(Employee(id=2, name="Staff", company_id=2, manager_id=1))
 
-    # second form
-    assert at.selectbox[1].label == "Select One To Many to Delete"
-    assert at.selectbox[1].options == ["FF"]
-    assert len(at.button) == 0
+    # the manager is not in the listed rows, it only comes from the chain
+    (staff,) = Employee.st_list_all(filter_by={"name": "Staff"})
+    assert staff.company.name == "Staff Co"
+    # the company of the manager, not the one of the listed employee
+    assert staff.manager.company.name == "Boss Co"
+
+
+def test_list_all_filter_by_relationship(add_all):
+    add_all(Item(name="A", count=1), Item(name="B", count=2))
+    a, b = Item.st_list_all()
+    add_all(
+        OneToMany(first_field="FF", test_item_id=a.id),
+        OneToMany(first_field="GG", test_item_id=b.id),
+    )
+
+    # mapped objects are not hashable by the cache, they are keyed by id
+    assert [o.first_field for o in OneToMany.st_list_all({"test_item": a})] == ["FF"]
+    assert [o.first_field for o in OneToMany.st_list_all({"test_item": b})] == ["GG"]
+
+
+def test_repr_and_order_by_without_mixin():
+    # e.g. the target of a foreign key, mapped without the mixin
+    class Plain(declarative_base()):
+        __tablename__ = "plain"
+
+        id = Column(Integer, primary_key=True)
+        name = Column(String)
 
+        __st_repr__ = lambda self: f"P:{self.name}"
+        __st_order_by__ = lambda self: self.name.desc()
 
-def test_delete_button_several_items(database):
-    # create item
+    assert _st_repr(Plain(name="a")) == "P:a"
+    assert str(_st_order_by(Plain)) == "plain.name DESC"
+
+
+def test_list_all_strict_loading(database, monkeypatch):
+    monkeypatch.setattr(Item, "__st_strict_loading__", True, raising=False)
     Item._st_create(name="A", count=1)
-    Item._st_create(name="C", count=2)
-    Item._st_create(name="B", count=3)
 
-    OneToMany._st_create(first_field="FF", test_item_id=None)
+    item = Item.st_list_all()[0]
+    with pytest.raises(InvalidRequestError):
+        item.one_to_many
 
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/delete_button.py",
-        default_timeout=10,
-    ).run(timeout=10)
 
-    # first form
-    assert at.button[0].label == "Delete"
-    assert at.button[1].label == "Delete"
-    assert at.button[2].label == "Delete"
-    assert at.button[3].label == "Delete OTM"
-    assert len(at.button) == 4
+def test_list_rows(add_all):
+    add_all(Item(name="B", count=2), Item(name="A", count=1))
+
+    assert Item.st_list_rows() == [
+        {"id": 2, "name": "A", "count": 1},
+        {"id": 1, "name": "B", "count": 2},
+    ]
+    assert Item.st_list_rows(filter_by={"count": 2}) == [
+        {"id": 1, "name": "B", "count": 2}
+    ]
+
+
+def test_create_many(database):
+    Item.st_create_many([{"name": "B", "count": 2}, {"name": "A", "count": 1}])
+
+    assert [(i.name, i.count) for i in Item.st_list_all()] == [("A", 1), ("B", 2)]
+
+
+def test_initialize_sqlite_pragmas(database):
+    # an in-memory database has no WAL, only the synchronous pragma applies
+    with database.session as session:
+        assert session.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+
+
+def test_initialize_sqlite_pragmas_again(database):
+    other = st.connection("test_pragmas", type="sql", url="sqlite://")
+    try:
+        StreamlitAlchemyMixin.st_initialize(other)
+        assert not event.contains(other.engine, "connect", _st_set_sqlite_pragmas)
+
+        # the same connection again, only asking for the pragmas now
+        StreamlitAlchemyMixin.st_initialize(other, sqlite_pragmas=True)
+        assert event.contains(other.engine, "connect", _st_set_sqlite_pragmas)
+    finally:
+        StreamlitAlchemyMixin.st_initialize(database)
+        other.engine.dispose()
 
 
-def test_edit_button(database):
-    # create item
+def test_session_update_dirty_columns(database):
     Item._st_create(name="A", count=1)
-    Item._st_create(name="C", count=2)
-    Item._st_create(name="B", count=3)
+    item = Item.st_list_all()[0]
+    item.count = 5
+    item._st_session_update()
 
-    OneToMany._st_create(first_field="FF", test_item_id=None)
+    item = Item.st_list_all()[0]
+    assert (item.name, item.count) == ("A", 5)
 
-    at = AppTest.from_file(
-        "tests/streamlit_sqlalchemy/mixin/edit_button.py",
-        default_timeout=10,
-    ).run(timeout=10)
 
-    # first form
-    assert at.button[0].label == "Add 1"
-    assert at.button[1].label == "Add 1"
-    assert at.button[2].label == "Add 1"
-    assert len(at.button) == 3
+def test_update_given_columns(database):
+    Item._st_create(name="A", count=1)
+    item = Item.st_list_all()[0]
+    Item._st_update(id=item.id, count=9)
+
+    item = Item.st_list_all()[0]
+    assert (item.name, item.count) == ("A", 9)
+
+
+def test_create_many_skips_failing_rows(database):
+    created = Item.st_create_many(
+        [
+            {"id": 1, "name": "A", "count": 1},
+            {"id": 1, "name": "B", "count": 2},
+            {"id": 2, "name": "C", "count": 3},
+        ],
+        batch_size=2,
+    )
+
+    assert created == 2
+    assert [i.name for i in Item.st_list_all()] == ["A", "C"]
+
+
+def test_update_many(add_all):
+    add_all(Item(name="A", count=1), Item(name="B", count=2))
+    a, b = Item.st_list_all()
+    Item.st_update_many([{"id": a.id, "count": 10}, {"id": b.id, "name": "C"}])
+
+    assert [(i.name, i.count) for i in Item.st_list_all()] == [("A", 10), ("C", 2)]
+
+
+def test_update_many_typed_columns(add_all):
+    add_all(AdvancedObject(name="A"), AdvancedObject(name="B"))
+    a, b = AdvancedObject.st_list_all()
+    due = datetime(2024, 1, 2, 3, 4)
+    AdvancedObject.st_update_many(
+        [
+            {"id": a.id, "my_enum": SimpleEnum.SECOND, "my_bool": True},
+            {"id": b.id, "my_bool": False, "due_datetime": due},
+        ]
+    )
+
+    a, b = AdvancedObject.st_list_all()
+    assert (a.my_enum, a.my_bool, a.due_datetime) == (SimpleEnum.SECOND, True, None)
+    assert (b.my_enum, b.my_bool, b.due_datetime) == (None, False, due)
+
+
+def test_create_integrity_error(database):
+    Item._st_create(id=1, name="A", count=1)
+    Item._st_create(id=1, name="B", count=2)
+
+    assert [i.name for i in Item.st_list_all()] == ["A"]
+
+
+def test_session_delete(add_all):
+    add_all(SuperItem(name="A", count=1), SuperItem(name="B", count=2))
+    SuperItem.st_list_all()[0]._st_session_delete()
+
+    assert [i.name for i in SuperItem.st_list_all()] == ["B"]
+
+
+def test_session_delete_without_relationships(add_all, monkeypatch):
+    assert not inspect(Company).relationships
+    add_all(Company(name="A"), Company(name="B"))
+
+    # a single DELETE statement, the unit of work is not involved
+    def session_delete(self, instance):
+        raise AssertionError("Session.delete called")
+
+    monkeypatch.setattr(Session, "delete", session_delete)
+    Company.st_list_all()[0]._st_session_delete()
+
+    assert [c.name for c in Company.st_list_all()] == ["B"]